@@ -1,36 +1,92 @@
+import os
+
+# Serving handles one request per thread; keep native libraries from spawning
+# their own thread pools (must be set before numpy/onnxruntime are imported)
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+os.environ.setdefault('OPENBLAS_NUM_THREADS', '1')
+os.environ.setdefault('MKL_NUM_THREADS', '1')
+
 from fastapi import FastAPI, HTTPException, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-import joblib
-import pandas as pd
+import onnxruntime as ort
 from src.feature_engineering import InvoiceFeatureExtractor
 from src.ocr_processor import InvoiceOCRProcessor
+from src.prediction_batcher import PredictionBatcher
+from contextlib import asynccontextmanager
 from datetime import datetime
 from typing import Optional
+import redis.asyncio as redis
 import numpy as np
-import os
+import hashlib
+import json
 import shutil
 
+@asynccontextmanager
+async def lifespan(app):
+    # Each worker process runs its own batcher on its own event loop
+    prediction_batcher.start()
+    yield
+    await prediction_batcher.stop()
+    ocr_processor.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Fake Invoice Detector API",
     description="AI-powered fake invoice detection system",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
-# Load trained models
+# ONNX Runtime session options tuned for single-invoice latency
+session_options = ort.SessionOptions()
+session_options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+session_options.intra_op_num_threads = 1
+
+def load_onnx_session(model_path):
+    """Create a CPU inference session for an exported ONNX model"""
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(model_path)
+    return ort.InferenceSession(
+        model_path, sess_options=session_options, providers=["CPUExecutionProvider"]
+    )
+
+def model_fingerprint(model_path):
+    """Hash the exported model so cached predictions are tied to the model that made them"""
+    with open(model_path, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=8).digest()
+
+# Load trained models (fused into one ONNX graph by src/export_onnx.py)
 try:
-    rf_model = joblib.load('models/random_forest_model.pkl')
-    xgb_model = joblib.load('models/xgb_model.pkl')
+    model_session = load_onnx_session('models/ensemble.onnx')
+    model_version = model_fingerprint('models/ensemble.onnx')
     print("Models loaded successfully")
 except FileNotFoundError:
-    print("Models not found. Please train the models first.")
-    rf_model = None
-    xgb_model = None
+    print("Models not found. Please train and export the models first.")
+    model_session = None
+    model_version = b""
 
 # Initialize feature extractor and OCR processor
 feature_extractor = InvoiceFeatureExtractor()
 ocr_processor = InvoiceOCRProcessor()
+feature_names = feature_extractor.get_feature_names()
+
+# Micro-batch concurrent /predict requests into single model calls
+def predict_ensemble_batch(x):
+    return model_session.run(['probabilities'], {'X': x})[0]
+
+prediction_batcher = PredictionBatcher(predict_ensemble_batch, max_batch_size=64, max_wait_ms=5)
+
+# Optional Redis cache for /predict responses (disabled when REDIS_URL is not set).
+# Short socket timeouts keep an unreachable cache from stalling predictions.
+REDIS_URL = os.getenv("REDIS_URL")
+PREDICTION_CACHE_TTL = int(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", "0.1"))
+redis_client = redis.from_url(
+    REDIS_URL, socket_connect_timeout=REDIS_TIMEOUT, socket_timeout=REDIS_TIMEOUT
+) if REDIS_URL else None
 
 # Create uploads directory if it doesn't exist
 os.makedirs("uploads", exist_ok=True)
@@ -68,40 +124,37 @@ def root():
 def health_check():
     return {
         "status": "healthy",
-        "models_loaded": rf_model is not None and xgb_model is not None,
+        "models_loaded": model_session is not None,
         "timestamp": datetime.now().isoformat()
     }
 
 @app.post("/predict", response_model=PredictionResponse)
-def predict_invoice(invoice: InvoiceData):
-    if rf_model is None or xgb_model is None:
+async def predict_invoice(invoice: InvoiceData):
+    if model_session is None:
         raise HTTPException(status_code=500, detail="Models not loaded")
     
+    # Return the cached response for an identical invoice
+    invoice_data = invoice.dict()
+    cache_key = prediction_cache_key(invoice_data)
+    cached_response = await get_cached_prediction(cache_key)
+    if cached_response is not None:
+        return cached_response
+    
     try:
-        # Convert to DataFrame
-        invoice_df = pd.DataFrame([invoice.dict()])
-        
         # Extract features
-        features = feature_extractor.extract_features(invoice_df)
-        
-        # Get predictions from both models
-        rf_prediction = rf_model.predict(features)[0]
-        rf_prob = rf_model.predict_proba(features)[0]
+        x = build_model_input(invoice_data)
         
-        xgb_prediction = xgb_model.predict(features)[0]
-        xgb_prob = xgb_model.predict_proba(features)[0]
-        
-        # Use ensemble prediction (average of both models)
-        ensemble_prob = (rf_prob + xgb_prob) / 2
+        # Use ensemble prediction (average of both models, computed inside the fused graph)
+        ensemble_prob = await prediction_batcher.predict(x[0])
         ensemble_prediction = 1 if ensemble_prob[1] > 0.5 else 0
         
         # Calculate confidence
         confidence = max(ensemble_prob) * 100
         
         # Identify risk factors
-        risk_factors = identify_risk_factors(features.iloc[0], invoice.dict())
+        risk_factors = identify_risk_factors(dict(zip(feature_names, x[0])), invoice_data)
         
-        return PredictionResponse(
+        response = PredictionResponse(
             is_fake=bool(ensemble_prediction),
             confidence=float(confidence),
             model_used="ensemble",
@@ -110,20 +163,21 @@ def predict_invoice(invoice: InvoiceData):
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction error: {str(e)}")
+    
+    await cache_prediction(cache_key, response)
+    return response
 
 @app.post("/predict/random_forest")
 def predict_random_forest(invoice: InvoiceData):
-    if rf_model is None:
+    if model_session is None:
         raise HTTPException(status_code=500, detail="Random Forest model not loaded")
     
     try:
-        invoice_df = pd.DataFrame([invoice.dict()])
-        features = feature_extractor.extract_features(invoice_df)
-        prediction = rf_model.predict(features)[0]
-        probability = rf_model.predict_proba(features)[0]
+        x = build_model_input(invoice.dict())
+        probability = model_session.run(['rf_probabilities'], {'X': x})[0][0]
         
         return {
-            "is_fake": bool(prediction),
+            "is_fake": bool(probability[1] > 0.5),
             "confidence": float(max(probability) * 100),
             "model_used": "random_forest"
         }
@@ -132,17 +186,15 @@ def predict_random_forest(invoice: InvoiceData):
 
 @app.post("/predict/xgboost")
 def predict_xgboost(invoice: InvoiceData):
-    if xgb_model is None:
+    if model_session is None:
         raise HTTPException(status_code=500, detail="XGBoost model not loaded")
     
     try:
-        invoice_df = pd.DataFrame([invoice.dict()])
-        features = feature_extractor.extract_features(invoice_df)
-        prediction = xgb_model.predict(features)[0]
-        probability = xgb_model.predict_proba(features)[0]
+        x = build_model_input(invoice.dict())
+        probability = model_session.run(['xgb_probabilities'], {'X': x})[0][0]
         
         return {
-            "is_fake": bool(prediction),
+            "is_fake": bool(probability[1] > 0.5),
             "confidence": float(max(probability) * 100),
             "model_used": "xgboost"
         }
@@ -172,6 +224,37 @@ def upload_invoice(file: UploadFile = File(...)):
 def get_feature_names():
     return {"features": feature_extractor.get_feature_names()}
 
+def prediction_cache_key(invoice_data):
+    """Hash the canonicalized invoice fields into a Redis key scoped to the loaded model"""
+    canonical = json.dumps(invoice_data, sort_keys=True).encode()
+    return b"predict:" + model_version + hashlib.blake2b(canonical, digest_size=16).digest()
+
+async def get_cached_prediction(cache_key):
+    """Look up a cached prediction; cache failures are treated as a miss"""
+    if redis_client is None:
+        return None
+    try:
+        cached = await redis_client.get(cache_key)
+    except redis.RedisError as e:
+        print(f"Prediction cache unavailable: {str(e)}")
+        return None
+    return PredictionResponse.parse_raw(cached) if cached else None
+
+async def cache_prediction(cache_key, response):
+    """Store a prediction in the cache; cache failures are ignored"""
+    if redis_client is None:
+        return
+    try:
+        await redis_client.setex(cache_key, PREDICTION_CACHE_TTL, response.json())
+    except redis.RedisError as e:
+        print(f"Prediction cache unavailable: {str(e)}")
+
+def build_model_input(invoice_data):
+    """Extract features for one invoice straight into the float32 model input"""
+    x = np.empty((1, len(feature_names)), dtype=np.float32)
+    feature_extractor.extract_features_single(invoice_data, out=x[0])
+    return x
+
 def identify_risk_factors(features, invoice_data):
     """Identify specific risk factors based on feature values"""
     risk_factors = {}
@@ -204,4 +287,6 @@ def identify_risk_factors(features, invoice_data):
 
 if __name__ == "__main__":
     import uvicorn
+    # Single-process dev server; uvicorn picks uvloop/httptools when installed.
+    # Production runs multiple workers through gunicorn.conf.py.
     uvicorn.run(app, host="0.0.0.0", port=8000)
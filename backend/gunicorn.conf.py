@@ -1,4 +1,6 @@
 # Gunicorn configuration for production deployment
+import gc
+
 bind = "0.0.0.0:8000"
 workers = 4
 worker_class = "uvicorn.workers.UvicornWorker"
@@ -7,6 +9,9 @@ max_requests = 1000
 max_requests_jitter = 100
 timeout = 30
 keepalive = 2
+
+# Load the app (models, feature extractor) once in the master so forked
+# workers share the read-only model memory copy-on-write
 preload_app = True
 
 # Logging
@@ -18,3 +23,9 @@ loglevel = "info"
 limit_request_line = 4094
 limit_request_fields = 100
 limit_request_field_size = 8190
+
+# Hooks
+def when_ready(server):
+    # Move the preloaded objects out of the garbage collector's reach so
+    # collections in the workers don't write to (and un-share) their pages
+    gc.freeze()
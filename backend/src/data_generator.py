@@ -1,12 +1,12 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-import random
 import string
 
 class InvoiceDataGenerator:
-    def __init__(self, num_samples=1000):
+    def __init__(self, num_samples=1000, seed=None):
         self.num_samples = num_samples
+        self.rng = np.random.default_rng(seed)
         self.genuine_vendors = [
             "Microsoft Corp", "Apple Inc", "Google LLC", "Amazon Web Services",
             "IBM Corporation", "Oracle Corporation", "Salesforce Inc"
@@ -15,6 +15,18 @@ class InvoiceDataGenerator:
             "Microsft Corp", "Aple Inc", "Gogle LLC", "Amazon Web Servces",
             "IBM Corporaton", "Oracl Corporation", "Salesforec Inc"
         ]
+        self.genuine_descriptions = [
+            "Software licensing and support services",
+            "Cloud computing services for Q1 2024",
+            "Professional consulting services",
+            "Hardware procurement and installation"
+        ]
+        self.fake_descriptions = [
+            "Miscellaneous services and products",
+            "General business expenses",
+            "Various professional services",
+            "Emergency maintenance work"
+        ]
     
     def generate_invoice_data(self):
         """Generate both genuine and fake invoice data"""
@@ -23,104 +35,79 @@ class InvoiceDataGenerator:
         
         # Combine and shuffle
         all_data = pd.concat([genuine_data, fake_data], ignore_index=True)
-        all_data = all_data.sample(frac=1).reset_index(drop=True)
+        all_data = all_data.sample(frac=1, random_state=self.rng).reset_index(drop=True)
         
         return all_data
     
     def _generate_genuine_invoices(self):
         """Generate genuine invoice data with realistic patterns"""
-        data = []
+        n = self.num_samples // 2
         
-        for i in range(self.num_samples // 2):
-            # Genuine invoices have consistent patterns
-            vendor = random.choice(self.genuine_vendors)
-            amount = round(random.uniform(100, 10000), 2)
-            tax_rate = 0.18  # Standard tax rate
-            tax_amount = round(amount * tax_rate, 2)
-            
-            # Generate realistic invoice number
-            invoice_num = f"INV-{random.randint(1000, 9999)}"
-            
-            # Generate description
-            descriptions = [
-                "Software licensing and support services",
-                "Cloud computing services for Q1 2024",
-                "Professional consulting services",
-                "Hardware procurement and installation"
-            ]
-            
-            data.append({
-                'invoice_id': invoice_num,
-                'vendor_name': vendor,
-                'amount': amount,
-                'tax_amount': tax_amount,
-                'tax_rate': tax_rate,
-                'description': random.choice(descriptions),
-                'date': self._generate_date(),
-                'is_fake': 0  # 0 = genuine
-            })
+        # Genuine invoices have consistent patterns
+        amounts = self.rng.uniform(100, 10000, n).round(2)
+        tax_rates = np.full(n, 0.18)  # Standard tax rate
         
-        return pd.DataFrame(data)
+        return pd.DataFrame({
+            'invoice_id': self._generate_invoice_numbers(n),  # Realistic invoice numbers
+            'vendor_name': self.rng.choice(self.genuine_vendors, n),
+            'amount': amounts,
+            'tax_amount': (amounts * tax_rates).round(2),
+            'tax_rate': tax_rates,
+            'description': self.rng.choice(self.genuine_descriptions, n),
+            'date': self._generate_dates(n),
+            'is_fake': 0  # 0 = genuine
+        })
     
     def _generate_fake_invoices(self):
         """Generate fake invoice data with suspicious patterns"""
-        data = []
+        n = self.num_samples // 2
         
-        for i in range(self.num_samples // 2):
-            # Fake invoices have suspicious patterns
-            vendor = random.choice(self.fake_vendors)  # Misspelled names
-            
-            # Unusual amounts (round numbers, very high/low)
-            if random.random() < 0.3:
-                amount = random.choice([1000, 5000, 10000, 25000])  # Suspiciously round
-            else:
-                amount = round(random.uniform(50, 50000), 2)
-            
-            # Incorrect tax calculations
-            if random.random() < 0.4:
-                tax_rate = random.uniform(0.05, 0.30)  # Unusual tax rate
-                tax_amount = round(amount * tax_rate + random.uniform(-50, 50), 2)  # Wrong calculation
-            else:
-                tax_rate = 0.18
-                tax_amount = round(amount * tax_rate, 2)
-            
-            # Suspicious invoice numbers
-            if random.random() < 0.3:
-                invoice_num = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-            else:
-                invoice_num = f"INV-{random.randint(1000, 9999)}"
-            
-            # Suspicious descriptions
-            fake_descriptions = [
-                "Miscellaneous services and products",
-                "General business expenses",
-                "Various professional services",
-                "Emergency maintenance work"
-            ]
-            
-            data.append({
-                'invoice_id': invoice_num,
-                'vendor_name': vendor,
-                'amount': amount,
-                'tax_amount': tax_amount,
-                'tax_rate': tax_rate,
-                'description': random.choice(fake_descriptions),
-                'date': self._generate_date(),
-                'is_fake': 1  # 1 = fake
-            })
+        # Unusual amounts (round numbers, very high/low)
+        round_amounts = self.rng.choice([1000.0, 5000.0, 10000.0, 25000.0], n)  # Suspiciously round
+        normal_amounts = self.rng.uniform(50, 50000, n).round(2)
+        amounts = np.where(self.rng.random(n) < 0.3, round_amounts, normal_amounts)
         
-        return pd.DataFrame(data)
-    
-    def _generate_date(self):
-        """Generate a random date within the last year"""
-        start_date = datetime.now() - timedelta(days=365)
-        end_date = datetime.now()
+        # Incorrect tax calculations
+        wrong_tax = self.rng.random(n) < 0.4
+        unusual_rates = self.rng.uniform(0.05, 0.30, n)  # Unusual tax rate
+        tax_errors = self.rng.uniform(-50, 50, n)  # Wrong calculation
+        tax_rates = np.where(wrong_tax, unusual_rates, 0.18)
+        tax_amounts = np.where(
+            wrong_tax, amounts * tax_rates + tax_errors, amounts * tax_rates
+        ).round(2)
         
-        time_between = end_date - start_date
-        days_between = time_between.days
-        random_days = random.randrange(days_between)
+        # Suspicious invoice numbers
+        invoice_nums = np.where(
+            self.rng.random(n) < 0.3,
+            self._generate_random_codes(n, 8),
+            self._generate_invoice_numbers(n)
+        )
         
-        return start_date + timedelta(days=random_days)
+        return pd.DataFrame({
+            'invoice_id': invoice_nums,
+            'vendor_name': self.rng.choice(self.fake_vendors, n),  # Misspelled names
+            'amount': amounts,
+            'tax_amount': tax_amounts,
+            'tax_rate': tax_rates,
+            'description': self.rng.choice(self.fake_descriptions, n),  # Suspicious descriptions
+            'date': self._generate_dates(n),
+            'is_fake': 1  # 1 = fake
+        })
+    
+    def _generate_invoice_numbers(self, n):
+        """Generate standard INV-#### invoice numbers"""
+        return np.char.add('INV-', self.rng.integers(1000, 10000, n).astype(str))
+    
+    def _generate_random_codes(self, n, length):
+        """Generate random uppercase alphanumeric codes"""
+        alphabet = np.array(list(string.ascii_uppercase + string.digits))
+        chars = alphabet[self.rng.integers(0, len(alphabet), (n, length))]
+        return chars.view(f'<U{length}').ravel()
+    
+    def _generate_dates(self, n):
+        """Generate random dates within the last year"""
+        start_date = datetime.now() - timedelta(days=365)
+        return start_date + pd.to_timedelta(self.rng.integers(0, 365, n), unit='D')
     
     def save_data(self, filename='invoice_data.csv'):
         """Generate and save the invoice data"""
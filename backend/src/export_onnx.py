@@ -0,0 +1,98 @@
+import joblib
+import numpy as np
+import onnx
+import onnxmltools
+import onnxruntime as ort
+import pandas as pd
+from onnx import compose, helper, numpy_helper
+from onnxmltools.convert.common.data_types import FloatTensorType as XGBFloatTensorType
+from skl2onnx import convert_sklearn
+from skl2onnx.common.data_types import FloatTensorType
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import train_test_split
+from feature_engineering import InvoiceFeatureExtractor
+
+# Number of input features expected by both models
+extractor = InvoiceFeatureExtractor()
+n_features = len(extractor.get_feature_names())
+
+# Maximum ROC-AUC loss accepted from the float32 ONNX conversion
+MAX_AUC_DROP = 0.01
+
+# Load trained models
+rf_model = joblib.load('models/random_forest_model.pkl')
+xgb_model = joblib.load('models/xgb_model.pkl')
+
+# Convert Random Forest model (zipmap disabled so probabilities come back as a plain tensor)
+rf_onnx = convert_sklearn(
+    rf_model,
+    initial_types=[('X', FloatTensorType([None, n_features]))],
+    options={id(rf_model): {'zipmap': False}}
+)
+
+# Convert XGBoost model (the converter only understands the default 'f%d' feature names)
+xgb_model.get_booster().feature_names = None
+xgb_onnx = onnxmltools.convert_xgboost(
+    xgb_model,
+    initial_types=[('X', XGBFloatTensorType([None, n_features]))]
+)
+
+# Fuse both tree ensembles into one graph that shares the input and averages the probabilities
+rf_graph = compose.add_prefix(rf_onnx, 'rf_').graph
+xgb_graph = compose.add_prefix(xgb_onnx, 'xgb_').graph
+
+nodes = [
+    helper.make_node('Identity', ['X'], ['rf_X']),
+    helper.make_node('Identity', ['X'], ['xgb_X']),
+    *rf_graph.node,
+    *xgb_graph.node,
+    helper.make_node('Add', ['rf_probabilities', 'xgb_probabilities'], ['probabilities_sum']),
+    helper.make_node('Mul', ['probabilities_sum', 'half'], ['probabilities']),
+]
+outputs = [
+    *[output for output in rf_graph.output if output.name == 'rf_probabilities'],
+    *[output for output in xgb_graph.output if output.name == 'xgb_probabilities'],
+    helper.make_tensor_value_info('probabilities', onnx.TensorProto.FLOAT, [None, 2]),
+]
+graph = helper.make_graph(
+    nodes,
+    'invoice_ensemble',
+    [helper.make_tensor_value_info('X', onnx.TensorProto.FLOAT, [None, n_features])],
+    outputs,
+    initializer=[numpy_helper.from_array(np.array(0.5, dtype=np.float32), name='half')]
+)
+
+# Keep the highest opset of each domain used by the two models
+opsets = {}
+for opset in [*rf_onnx.opset_import, *xgb_onnx.opset_import]:
+    opsets[opset.domain] = max(opsets.get(opset.domain, 0), opset.version)
+
+ensemble_onnx = helper.make_model(
+    graph,
+    opset_imports=[helper.make_opsetid(domain, version) for domain, version in opsets.items()]
+)
+ensemble_onnx.ir_version = max(rf_onnx.ir_version, xgb_onnx.ir_version)
+onnx.checker.check_model(ensemble_onnx)
+
+# Check the drift introduced by the float32 thresholds on the same held-out split as model_trainer.py
+invoice_data = pd.read_csv('data/invoice_data.csv')
+features = extractor.extract_features_batch(invoice_data)
+_, X_test, _, y_test = train_test_split(
+    features, invoice_data['is_fake'], test_size=0.2, random_state=42
+)
+reference_prob = (rf_model.predict_proba(X_test) + xgb_model.predict_proba(X_test)) / 2
+session = ort.InferenceSession(
+    ensemble_onnx.SerializeToString(), providers=["CPUExecutionProvider"]
+)
+onnx_prob = session.run(['probabilities'], {'X': X_test})[0]
+
+reference_auc = roc_auc_score(y_test, reference_prob[:, 1])
+onnx_auc = roc_auc_score(y_test, onnx_prob[:, 1])
+print(f"ROC-AUC original: {reference_auc:.4f}, ONNX: {onnx_auc:.4f}")
+print(f"Max probability difference: {np.abs(reference_prob - onnx_prob).max():.2e}")
+if reference_auc - onnx_auc > MAX_AUC_DROP:
+    raise SystemExit("ONNX model drifted too far from the trained models, not saving it.")
+
+# Save ONNX model
+onnx.save_model(ensemble_onnx, 'models/ensemble.onnx')
+print("ONNX model saved to 'models/ensemble.onnx'.")
@@ -1,9 +1,46 @@
 import pandas as pd
 import numpy as np
-from textblob import TextBlob
 from datetime import datetime
 import re
-from difflib import SequenceMatcher
+import ahocorasick
+from rapidfuzz import fuzz, process
+from numba import njit, prange
+
+@njit('float32(uint8[::1], uint8[::1])')
+def _indel_ratio(a, b):
+    """Normalized insert/delete edit similarity of two byte strings (same scale as difflib's ratio)"""
+    n = a.shape[0]
+    m = b.shape[0]
+    if n + m == 0:
+        return 1.0
+    
+    # Two-row dynamic programming over the edit distance matrix
+    prev = np.empty(m + 1, dtype=np.int32)
+    curr = np.empty(m + 1, dtype=np.int32)
+    for j in range(m + 1):
+        prev[j] = j
+    for i in range(1, n + 1):
+        curr[0] = i
+        ai = a[i - 1]
+        for j in range(1, m + 1):
+            if ai == b[j - 1]:
+                curr[j] = prev[j - 1]
+            else:
+                curr[j] = min(prev[j], curr[j - 1]) + 1
+        prev, curr = curr, prev
+    
+    return 1.0 - prev[m] / (n + m)
+
+@njit(parallel=True, fastmath=True, error_model='numpy')
+def _tax_accuracy_kernel(amounts, tax_amounts, tax_rates, out):
+    """Fused tax accuracy over whole columns, written into out"""
+    for i in prange(amounts.shape[0]):
+        expected_tax = amounts[i] * tax_rates[i]
+        out[i] = 1.0 / (1.0 + abs(tax_amounts[i] - expected_tax) / (expected_tax + 1e-6))
+
+def _to_bytes(text):
+    """Lowercase a string into a uint8 array for the similarity kernel"""
+    return np.frombuffer(bytearray(text.lower().encode('ascii', 'ignore')), dtype=np.uint8)
 
 class InvoiceFeatureExtractor:
     def __init__(self):
@@ -13,12 +50,35 @@ class InvoiceFeatureExtractor:
             "IBM Corporation", "Oracle Corporation", "Salesforce Inc", "Adobe Systems",
             "Intel Corporation", "Cisco Systems", "Dell Technologies", "HP Inc"
         ]
+        self._legit_bytes = [_to_bytes(vendor) for vendor in self.legitimate_vendors]
+        self._legit_lower = [vendor.lower() for vendor in self.legitimate_vendors]
         
         # Common legitimate invoice description patterns
         self.legitimate_descriptions = [
             "software licensing", "cloud services", "consulting services", 
             "hardware procurement", "maintenance support", "technical support"
         ]
+        
+        # Vague description terms (negative indicators)
+        self.vague_terms = ["miscellaneous", "various", "general", "emergency", "urgent"]
+        
+        # Single automaton finding every legitimate (+1) and vague (-1) term in one pass
+        self._term_automaton = ahocorasick.Automaton()
+        for term in self.legitimate_descriptions:
+            self._term_automaton.add_word(term, (term, 1))
+        for term in self.vague_terms:
+            self._term_automaton.add_word(term, (term, -1))
+        self._term_automaton.make_automaton()
+        
+        # Invoice ID formats, matched in a single pass and scored by group name
+        self._id_re = re.compile(
+            r'^(?:(?P<std>INV-\d{4})|(?P<yr>\d{4}-\d{3})|(?P<co>[A-Z]{2,3}-\d{4,6}))$'
+        )
+        self._id_pattern_scores = {
+            'std': 1.0,  # Standard format
+            'yr': 0.8,   # Year-number format
+            'co': 0.6    # Company prefix format
+        }
     
     def extract_features(self, invoice_data):
         """
@@ -28,91 +88,166 @@ class InvoiceFeatureExtractor:
             invoice_data: DataFrame or dict containing invoice information
             
         Returns:
-            DataFrame with extracted features
+            float32 array of shape (n_invoices, n_features) in get_feature_names() order
         """
         if isinstance(invoice_data, dict):
             invoice_data = pd.DataFrame([invoice_data])
         
-        features = pd.DataFrame()
+        return self.extract_features_batch(invoice_data)
+    
+    def extract_features_batch(self, invoice_data):
+        """
+        Extract features for a whole DataFrame of invoices using vectorized operations
+        
+        Args:
+            invoice_data: DataFrame containing invoice information
+            
+        Returns:
+            float32 array of shape (n_invoices, n_features) in get_feature_names() order
+        """
+        amounts = invoice_data['amount'].to_numpy(dtype=np.float64)
+        tax_amounts = invoice_data['tax_amount'].to_numpy(dtype=np.float64)
+        tax_rates = invoice_data['tax_rate'].to_numpy(dtype=np.float64)
+        descriptions = invoice_data['description']
+        invoice_ids = invoice_data['invoice_id']
+        dates = self._parse_dates(invoice_data['date'])
+        
+        out = np.empty((len(invoice_data), len(self.get_feature_names())), dtype=np.float32)
         
         # Text-based features
-        features['vendor_name_similarity'] = invoice_data['vendor_name'].apply(
-            self._calculate_vendor_similarity
-        )
-        features['description_legitimacy'] = invoice_data['description'].apply(
-            self._analyze_description_legitimacy
-        )
-        features['description_sentiment'] = invoice_data['description'].apply(
-            self._calculate_sentiment
-        )
-        features['description_length'] = invoice_data['description'].apply(len)
-        features['description_word_count'] = invoice_data['description'].apply(
-            lambda x: len(x.split())
-        )
+        out[:, 0] = self._calculate_vendor_similarity_batch(invoice_data['vendor_name'])
+        out[:, 1] = self._analyze_description_legitimacy_batch(descriptions.str.lower())
+        out[:, 2] = descriptions.str.len().to_numpy()
+        out[:, 3] = descriptions.str.split().str.len().to_numpy()
         
         # Numerical features
-        features['amount_roundness'] = invoice_data['amount'].apply(
-            self._calculate_amount_roundness
+        out[:, 4] = np.where(
+            amounts % 1000 == 0, 1.0,
+            np.where(amounts % 100 == 0, 0.7, np.where(amounts % 10 == 0, 0.3, 0.0))
         )
-        features['tax_accuracy'] = self._calculate_tax_accuracy(
-            invoice_data['amount'], invoice_data['tax_amount'], invoice_data['tax_rate']
-        )
-        features['amount_log'] = np.log1p(invoice_data['amount'])
-        features['tax_rate_deviation'] = abs(invoice_data['tax_rate'] - 0.18)  # Standard rate
+        _tax_accuracy_kernel(amounts, tax_amounts, tax_rates, out[:, 5])
+        out[:, 6] = np.log1p(amounts)
+        out[:, 7] = np.abs(tax_rates - 0.18)  # Standard rate
         
         # Invoice ID patterns
-        features['invoice_id_pattern'] = invoice_data['invoice_id'].apply(
-            self._analyze_invoice_id_pattern
-        )
-        features['invoice_id_length'] = invoice_data['invoice_id'].apply(len)
+        out[:, 8] = self._analyze_invoice_id_pattern_batch(invoice_ids)
+        out[:, 9] = invoice_ids.str.len().to_numpy()
         
         # Date-based features
-        features['date_recency'] = invoice_data['date'].apply(
-            self._calculate_date_recency
-        )
-        features['is_weekend'] = invoice_data['date'].apply(
-            self._is_weekend
+        days_old = (pd.Timestamp.now() - dates).dt.days.to_numpy()
+        out[:, 10] = np.select(
+            [days_old < 30, days_old < 90, days_old < 365], [1.0, 0.8, 0.6], 0.2
         )
+        out[:, 11] = dates.dt.weekday.to_numpy() >= 5
         
         # Combined features
-        features['amount_to_tax_ratio'] = invoice_data['amount'] / (invoice_data['tax_amount'] + 1e-6)
-        features['total_amount'] = invoice_data['amount'] + invoice_data['tax_amount']
+        out[:, 12] = amounts / (tax_amounts + 1e-6)
+        out[:, 13] = amounts + tax_amounts
         
-        return features
+        return out
+
+    def extract_features_single(self, invoice, out=None):
+        """
+        Extract features for a single invoice without going through pandas
+
+        Args:
+            invoice: dict containing invoice information
+            out: Optional preallocated float32 array to write the features into
+
+        Returns:
+            1-D float32 array with features in get_feature_names() order
+        """
+        if out is None:
+            out = np.empty(len(self.get_feature_names()), dtype=np.float32)
+
+        description = invoice['description']
+        description_lower = description.lower()
+        words = description_lower.split()
+        amount = invoice['amount']
+        tax_amount = invoice['tax_amount']
+        tax_rate = invoice['tax_rate']
+        invoice_id = invoice['invoice_id']
+        date = self._parse_date(invoice['date'])
+        days_old = (datetime.now() - date).days
+
+        # Text-based features
+        out[0] = self._calculate_vendor_similarity(invoice['vendor_name'])
+        out[1] = self._analyze_description_legitimacy_lower(description_lower)
+        out[2] = len(description)
+        out[3] = len(words)
+
+        # Numerical features
+        out[4] = self._calculate_amount_roundness(amount)
+        out[5] = self._calculate_tax_accuracy(amount, tax_amount, tax_rate)
+        out[6] = np.log1p(amount)
+        out[7] = abs(tax_rate - 0.18)  # Standard rate
+
+        # Invoice ID patterns
+        out[8] = self._analyze_invoice_id_pattern(invoice_id)
+        out[9] = len(invoice_id)
+
+        # Date-based features
+        out[10] = self._calculate_date_recency(days_old)
+        out[11] = self._is_weekend(date)
+
+        # Combined features
+        out[12] = amount / (tax_amount + 1e-6)
+        out[13] = amount + tax_amount
+
+        return out
+
+    def _parse_date(self, date):
+        """Parse an invoice date (day precision), using the fast ISO parser when possible"""
+        if not isinstance(date, str):
+            return date
+        try:
+            return datetime.fromisoformat(date[:10])
+        except ValueError:
+            return pd.to_datetime(date).normalize()
     
+    def _parse_dates(self, dates):
+        """Parse a Series of invoice dates (day precision), using a fixed ISO format when possible"""
+        try:
+            return pd.to_datetime(dates.str[:10], format='%Y-%m-%d', cache=True)
+        except (AttributeError, ValueError):
+            return pd.to_datetime(dates, cache=True).dt.normalize()
+
     def _calculate_vendor_similarity(self, vendor_name):
         """Calculate similarity to known legitimate vendors"""
-        max_similarity = 0
-        for legit_vendor in self.legitimate_vendors:
-            similarity = SequenceMatcher(None, vendor_name.lower(), legit_vendor.lower()).ratio()
+        vendor_bytes = _to_bytes(vendor_name)
+        max_similarity = 0.0
+        for legit_bytes in self._legit_bytes:
+            similarity = _indel_ratio(vendor_bytes, legit_bytes)
             max_similarity = max(max_similarity, similarity)
         return max_similarity
     
+    def _calculate_vendor_similarity_batch(self, vendor_names):
+        """Calculate similarity to known legitimate vendors for a Series of vendor names"""
+        # Same ascii-only lowercasing and Indel ratio as the single-invoice kernel
+        queries = vendor_names.str.lower().str.encode('ascii', 'ignore').str.decode('ascii')
+        scores = process.cdist(
+            queries.tolist(), self._legit_lower, scorer=fuzz.ratio, dtype=np.float32, workers=-1
+        )
+        return scores.max(axis=1) / 100.0
+    
     def _analyze_description_legitimacy(self, description):
         """Analyze if description contains legitimate business terms"""
-        description_lower = description.lower()
-        legitimacy_score = 0
-        
-        # Check for legitimate business terms
-        for term in self.legitimate_descriptions:
-            if term in description_lower:
-                legitimacy_score += 1
-        
-        # Check for vague terms (negative indicators)
-        vague_terms = ["miscellaneous", "various", "general", "emergency", "urgent"]
-        for term in vague_terms:
-            if term in description_lower:
-                legitimacy_score -= 1
+        return self._analyze_description_legitimacy_lower(description.lower())
+    
+    def _analyze_description_legitimacy_lower(self, description_lower):
+        """Description legitimacy for an already lowercased description"""
+        # Each term counts once, however often it occurs
+        matched_terms = dict(value for _, value in self._term_automaton.iter(description_lower))
+        legitimacy_score = sum(matched_terms.values())
         
         return max(0, legitimacy_score)  # Ensure non-negative
     
-    def _calculate_sentiment(self, description):
-        """Calculate sentiment polarity of description"""
-        try:
-            blob = TextBlob(description)
-            return blob.sentiment.polarity
-        except:
-            return 0
+    def _analyze_description_legitimacy_batch(self, descriptions_lower):
+        """Description legitimacy over a Series of lowercased descriptions"""
+        return np.fromiter(
+            (self._analyze_description_legitimacy_lower(d) for d in descriptions_lower.values),
+            dtype=np.int64, count=len(descriptions_lower)
+        )
     
     def _calculate_amount_roundness(self, amount):
         """Calculate how 'round' an amount is (fake invoices often use round numbers)"""
@@ -137,24 +272,25 @@ class InvoiceFeatureExtractor:
         # Legitimate patterns: INV-1234, 2024-001, etc.
         # Illegitimate: random strings, too short/long
         
-        if re.match(r'^INV-\d{4}$', invoice_id):
-            return 1.0  # Standard format
-        elif re.match(r'^\d{4}-\d{3}$', invoice_id):
-            return 0.8  # Year-number format
-        elif re.match(r'^[A-Z]{2,3}-\d{4,6}$', invoice_id):
-            return 0.6  # Company prefix format
+        match = self._id_re.match(invoice_id)
+        if match:
+            return self._id_pattern_scores[match.lastgroup]
         elif len(invoice_id) < 5 or len(invoice_id) > 15:
             return 0.2  # Too short or too long
         else:
             return 0.4  # Other patterns
     
-    def _calculate_date_recency(self, date):
-        """Calculate how recent the invoice date is"""
-        if isinstance(date, str):
-            date = pd.to_datetime(date)
-        
-        days_old = (datetime.now() - date).days
-        
+    def _analyze_invoice_id_pattern_batch(self, invoice_ids):
+        """Vectorized invoice ID pattern legitimacy over a Series of invoice IDs"""
+        groups = invoice_ids.str.extract(self._id_re)
+        lengths = invoice_ids.str.len().to_numpy()
+        conditions = [groups[name].notna().to_numpy() for name in self._id_pattern_scores]
+        conditions.append((lengths < 5) | (lengths > 15))
+        choices = list(self._id_pattern_scores.values()) + [0.2]
+        return np.select(conditions, choices, 0.4)
+    
+    def _calculate_date_recency(self, days_old):
+        """Calculate how recent the invoice date is from its age in days"""
         if days_old < 30:
             return 1.0  # Very recent
         elif days_old < 90:
@@ -166,19 +302,15 @@ class InvoiceFeatureExtractor:
     
     def _is_weekend(self, date):
         """Check if invoice date is on weekend (suspicious for business invoices)"""
-        if isinstance(date, str):
-            date = pd.to_datetime(date)
-        
         return 1 if date.weekday() >= 5 else 0
     
     def get_feature_names(self):
         """Return list of all feature names"""
         return [
-            'vendor_name_similarity', 'description_legitimacy', 'description_sentiment',
-            'description_length', 'description_word_count', 'amount_roundness',
-            'tax_accuracy', 'amount_log', 'tax_rate_deviation', 'invoice_id_pattern',
-            'invoice_id_length', 'date_recency', 'is_weekend', 'amount_to_tax_ratio',
-            'total_amount'
+            'vendor_name_similarity', 'description_legitimacy', 'description_length',
+            'description_word_count', 'amount_roundness', 'tax_accuracy', 'amount_log',
+            'tax_rate_deviation', 'invoice_id_pattern', 'invoice_id_length', 'date_recency',
+            'is_weekend', 'amount_to_tax_ratio', 'total_amount'
         ]
 
 # Usage example
@@ -199,6 +331,6 @@ if __name__ == "__main__":
     features = extractor.extract_features(df)
     
     print("Extracted Features:")
-    print(features)
+    print(pd.DataFrame(features, columns=extractor.get_feature_names()))
     print("\nFeature Names:")
     print(extractor.get_feature_names())
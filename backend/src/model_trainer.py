@@ -1,5 +1,5 @@
 import pandas as pd
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, cross_val_score
 from sklearn.ensemble import RandomForestClassifier
 from xgboost import XGBClassifier
 from sklearn.metrics import classification_report, accuracy_score
@@ -11,7 +11,7 @@ invoice_data = pd.read_csv('data/invoice_data.csv')
 
 # Feature extraction
 extractor = InvoiceFeatureExtractor()
-features = extractor.extract_features(invoice_data)
+features = extractor.extract_features_batch(invoice_data)
 feature_names = extractor.get_feature_names()
 
 # Labels
@@ -22,8 +22,26 @@ X_train, X_test, y_train, y_test = train_test_split(
     features, labels, test_size=0.2, random_state=42
 )
 
+# Select the smallest Random Forest within 0.5% of the best cross-validated ROC-AUC
+# (prediction cost grows with both tree count and depth)
+rf_candidates = []
+for n_estimators in [50, 100]:
+    for max_depth in [8, 12, None]:
+        candidate = RandomForestClassifier(
+            n_estimators=n_estimators, max_depth=max_depth, min_samples_leaf=5,
+            n_jobs=-1, random_state=42
+        )
+        auc = cross_val_score(candidate, X_train, y_train, cv=5, scoring='roc_auc').mean()
+        print(f"Random Forest n_estimators={n_estimators}, max_depth={max_depth}: ROC-AUC {auc:.4f}")
+        rf_candidates.append((auc, n_estimators, max_depth or float('inf'), candidate))
+
+best_auc = max(auc for auc, _, _, _ in rf_candidates)
+_, _, _, rf_model = min(
+    (c for c in rf_candidates if c[0] >= best_auc * 0.995), key=lambda c: (c[1], c[2])
+)
+print("Selected Random Forest:", rf_model)
+
 # Train Random Forest model
-rf_model = RandomForestClassifier(n_estimators=100, random_state=42)
 rf_model.fit(X_train, y_train)
 
 # Evaluate Random Forest model
@@ -1,21 +1,138 @@
-import pytesseract
+from tesserocr import PyTessBaseAPI, PSM, OEM
 import cv2
 import numpy as np
 from PIL import Image
-import re
-from typing import Dict, Optional
+try:
+    # RE2 matches in linear time, so noisy OCR text cannot trigger catastrophic backtracking
+    import re2 as re
+except ImportError:
+    import re
+import os
+import asyncio
+import hashlib
+import heapq
+import queue
+import threading
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import islice
+from typing import Dict, List, Optional
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Invoice field patterns, compiled once at import. Case-insensitivity is set
+# inline and lookarounds are avoided so the patterns compile under both RE2 and re.
+# Amounts, tax rate and date share one alternation scanned over the whole text;
+# separators are limited to spaces and tabs so each match stays on one line, and
+# labeled alternatives are tried before bare ones.
+_NUMBER = r'[0-9,]+\.?[0-9]*'
+_DMY_DATE = r'[0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4}'
+_YMD_DATE = r'[0-9]{4}[\/\-][0-9]{1,2}[\/\-][0-9]{1,2}'
+_INVOICE_FIELDS_RE = re.compile(
+    rf'(?i)(?:total|amount|subtotal)[ \t:]*\$?(?P<amount>{_NUMBER})'
+    rf'|(?:tax|vat)[ \t:]*(?P<tax_rate>[0-9]+\.?[0-9]*)[ \t]*%'
+    rf'|(?:date|issued)[ \t:]*(?P<date>{_DMY_DATE})'
+    rf'|\$(?P<dollar_amount>{_NUMBER})'
+    rf'|(?P<bare_date>{_YMD_DATE}|{_DMY_DATE})'
+)
+# Scanned separately so the ID cannot swallow a following field label
+_INVOICE_ID_RE = re.compile(r'(?i)(?:invoice|inv|bill)[ \t#]*:?[ \t]*([A-Z0-9\-]+)')
+# Vendor name from a labeled line or a line ending in a company suffix, searched over
+# the joined header lines
+_VENDOR_RE = re.compile(
+    r'(?im)(?:from|to|vendor|company)[ \t:]*([A-Za-z \t&.,]+)'
+    r'|^([A-Za-z \t&.,]+)(?:Inc|Corp|Ltd|LLC|Company)'
+)
+
+# Preprocessed images can be cached on disk by content hash. The cache is off unless
+# OCR_CACHE_DIR is set: entries are never evicted and keep a copy of every processed
+# invoice, so point it at storage you manage. Bump the version when preprocessing
+# changes so stale entries are ignored.
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR")
+_PREPROCESS_VERSION = 2
+
+# Longest image edge passed to preprocessing and OCR (accuracy saturates around this size)
+MAX_IMAGE_DIMENSION = 1600
+
+# Common service descriptions that mark a line as part of the invoice description
+_DESCRIPTION_KEYWORDS = (
+    'service', 'product', 'consulting', 'software', 'license',
+    'support', 'maintenance', 'hardware', 'equipment'
+)
+_DESCRIPTION_RE = re.compile('(?i)' + '|'.join(map(re.escape, _DESCRIPTION_KEYWORDS)))
+
+@lru_cache(maxsize=16)
+def _read_cached_image(cache_path: str) -> np.ndarray:
+    """Load a cached preprocessed image, keeping recently used ones in memory"""
+    image = cv2.imread(cache_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"Could not read cached image from {cache_path}")
+    # Shared between callers, so guard against in-place edits
+    image.setflags(write=False)
+    return image
+
+def _write_cached_image(cache_path: str, image: np.ndarray) -> None:
+    """Store a preprocessed image in the disk cache; cache failures are ignored"""
+    try:
+        os.makedirs(OCR_CACHE_DIR, exist_ok=True)
+        encoded = cv2.imencode('.png', image)[1]
+        # Write to a temporary file first so concurrent readers never see a partial image
+        with tempfile.NamedTemporaryFile(dir=OCR_CACHE_DIR, suffix='.tmp', delete=False) as f:
+            f.write(encoded.tobytes())
+        os.replace(f.name, cache_path)
+    except OSError as e:
+        logger.warning(f"OCR cache unavailable: {str(e)}")
+
 class InvoiceOCRProcessor:
-    def __init__(self):
-        """Initialize OCR processor with default settings"""
-        # Configure pytesseract if needed (path to tesseract executable)
-        # pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        pass
+    def __init__(self, max_apis: Optional[int] = None):
+        """
+        Initialize OCR processor with default settings
+        
+        Args:
+            max_apis: Maximum number of Tesseract APIs loaded at once (defaults to the CPU count)
+        """
+        # Tesseract APIs are not thread-safe, so concurrent calls each borrow one from a
+        # pool of idle APIs that keep their loaded language model until close(). OCR is
+        # CPU-bound, so the pool is capped and further calls wait for a free API.
+        # Set TESSDATA_PREFIX if the language data is not in the default location.
+        self._idle_apis = queue.LifoQueue()
+        self._api_slots = threading.BoundedSemaphore(max_apis or os.cpu_count())
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def close(self):
+        """Release the idle Tesseract APIs (call once OCR calls have finished)"""
+        while True:
+            try:
+                api = self._idle_apis.get_nowait()
+            except queue.Empty:
+                break
+            api.End()
+    
+    @contextmanager
+    def _borrow_api(self):
+        """Borrow an idle Tesseract API, loading a new one if all are in use and the cap allows"""
+        with self._api_slots:
+            try:
+                api = self._idle_apis.get_nowait()
+            except queue.Empty:
+                api = PyTessBaseAPI(psm=PSM.SINGLE_COLUMN, oem=OEM.DEFAULT)
+                # Pages are already binarized, so skip the inverted-text retry
+                api.SetVariable('tessedit_do_invert', '0')
+                api.SetVariable('preserve_interword_spaces', '1')
+            try:
+                yield api
+            finally:
+                self._idle_apis.put(api)
     
     def preprocess_image(self, image_path: str) -> np.ndarray:
         """
@@ -28,16 +145,34 @@ class InvoiceOCRProcessor:
             Preprocessed image as numpy array
         """
         try:
-            # Read the image
-            image = cv2.imread(image_path)
-            if image is None:
+            # Read the file once for both the cache key and decoding
+            with open(image_path, 'rb') as f:
+                data = f.read()
+            
+            # Reuse the result for a file that was already preprocessed
+            cache_path = None
+            if OCR_CACHE_DIR:
+                digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+                cache_path = os.path.join(OCR_CACHE_DIR, f"{digest}-v{_PREPROCESS_VERSION}.png")
+                if os.path.exists(cache_path):
+                    try:
+                        return _read_cached_image(cache_path)
+                    except ValueError as e:
+                        # Recompute and overwrite a corrupt or truncated entry
+                        logger.warning(f"Ignoring OCR cache entry: {str(e)}")
+            
+            # Decode straight to grayscale, skipping the color buffer and conversion
+            gray = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+            if gray is None:
                 raise ValueError(f"Could not read image from {image_path}")
             
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            # Downscale large photos so every later step touches fewer pixels
+            scale = min(1.0, MAX_IMAGE_DIMENSION / max(gray.shape))
+            if scale < 1.0:
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
             
             # Apply noise reduction
-            denoised = cv2.fastNlMeansDenoising(gray)
+            denoised = cv2.GaussianBlur(gray, (3, 3), 0)
             
             # Apply adaptive thresholding
             thresh = cv2.adaptiveThreshold(
@@ -45,22 +180,21 @@ class InvoiceOCRProcessor:
                 cv2.THRESH_BINARY, 11, 2
             )
             
-            # Apply morphological operations to clean up
-            kernel = np.ones((1, 1), np.uint8)
-            cleaned = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel)
-            
-            return cleaned
+            if cache_path:
+                _write_cached_image(cache_path, thresh)
+            return thresh
             
         except Exception as e:
             logger.error(f"Error preprocessing image: {str(e)}")
             raise
     
-    def extract_text_from_image(self, image_path: str) -> str:
+    def extract_text_from_image(self, image_path: str, psm: int = PSM.SINGLE_COLUMN) -> str:
         """
         Extract text from invoice image using OCR
         
         Args:
             image_path: Path to the invoice image
+            psm: Tesseract page segmentation mode (e.g. PSM.SPARSE_TEXT for scattered fields)
             
         Returns:
             Extracted text as string
@@ -69,11 +203,11 @@ class InvoiceOCRProcessor:
             # Preprocess the image
             processed_image = self.preprocess_image(image_path)
             
-            # Configure OCR settings
-            custom_config = r'--oem 3 --psm 6'
-            
-            # Extract text
-            text = pytesseract.image_to_string(processed_image, config=custom_config)
+            # Extract text with a resident Tesseract API
+            with self._borrow_api() as api:
+                api.SetPageSegMode(psm)
+                api.SetImage(Image.fromarray(processed_image))
+                text = api.GetUTF8Text()
             
             return text.strip()
             
@@ -81,6 +215,46 @@ class InvoiceOCRProcessor:
             logger.error(f"Error extracting text from image: {str(e)}")
             raise
     
+    def extract_text_from_images(self, image_paths: List[str], max_workers: Optional[int] = None) -> List[str]:
+        """
+        Extract text from several invoice images concurrently on a thread pool
+        
+        Safe to call from any context; async callers can await
+        extract_text_from_images_async instead.
+        
+        Args:
+            image_paths: Paths to the invoice images
+            max_workers: Maximum number of images processed at once (defaults to the CPU count)
+            
+        Returns:
+            Extracted text for each image, in input order
+        """
+        with ThreadPoolExecutor(max_workers or os.cpu_count()) as executor:
+            return list(executor.map(self.extract_text_from_image, image_paths))
+    
+    async def extract_text_from_images_async(self, image_paths: List[str], max_workers: Optional[int] = None) -> List[str]:
+        """
+        Extract text from several invoice images on worker threads
+        
+        OCR is CPU-bound, so running more images at once than there are CPUs
+        available only adds contention.
+        
+        Args:
+            image_paths: Paths to the invoice images
+            max_workers: Maximum number of images processed at once (defaults to the CPU count)
+            
+        Returns:
+            Extracted text for each image, in input order
+        """
+        semaphore = asyncio.Semaphore(max_workers or os.cpu_count())
+        
+        async def extract(image_path):
+            # OpenCV and Tesseract release the GIL, so pages run in parallel
+            async with semaphore:
+                return await asyncio.to_thread(self.extract_text_from_image, image_path)
+        
+        return await asyncio.gather(*(extract(image_path) for image_path in image_paths))
+    
     def parse_invoice_data(self, text: str) -> Dict[str, str]:
         """
         Parse extracted text to identify invoice fields
@@ -105,98 +279,54 @@ class InvoiceOCRProcessor:
             # Split text into lines
             lines = [line.strip() for line in text.split('\n') if line.strip()]
             
-            # Extract invoice ID
-            invoice_id_pattern = r'(?:invoice|inv|bill)[\s#]*:?\s*([A-Z0-9\-]+)'
-            for line in lines:
-                match = re.search(invoice_id_pattern, line, re.IGNORECASE)
-                if match:
-                    invoice_data['invoice_id'] = match.group(1)
-                    break
-            
             # Extract vendor name (usually in first few lines)
-            vendor_patterns = [
-                r'(?:from|to|vendor|company)[\s:]*([A-Za-z\s&.,]+)',
-                r'^([A-Za-z\s&.,]+)(?:Inc|Corp|Ltd|LLC|Company)',
-            ]
+            match = _VENDOR_RE.search('\n'.join(lines[:5]))  # Check first 5 lines
+            if match:
+                invoice_data['vendor_name'] = (match.group(1) or match.group(2)).strip()
             
-            for line in lines[:5]:  # Check first 5 lines
-                for pattern in vendor_patterns:
-                    match = re.search(pattern, line, re.IGNORECASE)
-                    if match:
-                        invoice_data['vendor_name'] = match.group(1).strip()
-                        break
-                if invoice_data['vendor_name']:
-                    break
-            
-            # Extract amounts
-            amount_patterns = [
-                r'(?:total|amount|subtotal)[\s:]*\$?([0-9,]+\.?[0-9]*)',
-                r'(?:total|amount|subtotal)[\s:]*([0-9,]+\.?[0-9]*)',
-                r'\$([0-9,]+\.?[0-9]*)',
-            ]
-            
-            amounts = []
-            for line in lines:
-                for pattern in amount_patterns:
-                    matches = re.findall(pattern, line, re.IGNORECASE)
-                    for match in matches:
-                        # Clean and validate amount
-                        clean_amount = match.replace(',', '')
-                        try:
-                            float(clean_amount)
-                            amounts.append(clean_amount)
-                        except ValueError:
-                            continue
+            # Extract invoice ID
+            match = _INVOICE_ID_RE.search(text)
+            if match:
+                invoice_data['invoice_id'] = match.group(1)
+            
+            # Extract amounts, tax rate and date in one pass over the text
+            # Only the two largest amounts are used, so keep a running top-2 min-heap
+            top_amounts = []
+            for match in _INVOICE_FIELDS_RE.finditer(text):
+                field = match.lastgroup
+                value = match.group(field)
+                if field in ('amount', 'dollar_amount'):
+                    # Clean and validate amount
+                    try:
+                        amount = float(value.replace(',', ''))
+                    except ValueError:
+                        continue
+                    if len(top_amounts) < 2:
+                        heapq.heappush(top_amounts, amount)
+                    else:
+                        heapq.heappushpop(top_amounts, amount)
+                elif field == 'tax_rate':
+                    if not invoice_data['tax_rate']:
+                        invoice_data['tax_rate'] = str(float(value) / 100)
+                elif not invoice_data['date']:
+                    invoice_data['date'] = value
             
             # Assign amounts (largest is usually total)
-            if amounts:
-                amounts_float = [float(amt) for amt in amounts]
-                amounts_float.sort(reverse=True)
-                
-                if len(amounts_float) >= 1:
-                    invoice_data['amount'] = str(amounts_float[0])
-                if len(amounts_float) >= 2:
-                    invoice_data['tax_amount'] = str(amounts_float[0] - amounts_float[1])
-            
-            # Extract tax rate
-            tax_rate_pattern = r'(?:tax|vat)[\s:]*([0-9]+\.?[0-9]*)\s*%'
-            for line in lines:
-                match = re.search(tax_rate_pattern, line, re.IGNORECASE)
-                if match:
-                    invoice_data['tax_rate'] = str(float(match.group(1)) / 100)
-                    break
-            
-            # Extract date
-            date_patterns = [
-                r'(?:date|issued)[\s:]*([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})',
-                r'([0-9]{1,2}[\/\-][0-9]{1,2}[\/\-][0-9]{2,4})',
-                r'([0-9]{4}[\/\-][0-9]{1,2}[\/\-][0-9]{1,2})',
-            ]
-            
-            for line in lines:
-                for pattern in date_patterns:
-                    match = re.search(pattern, line, re.IGNORECASE)
-                    if match:
-                        invoice_data['date'] = match.group(1)
-                        break
-                if invoice_data['date']:
-                    break
+            if len(top_amounts) == 1:
+                invoice_data['amount'] = str(top_amounts[0])
+            elif top_amounts:
+                second, largest = sorted(top_amounts)
+                invoice_data['amount'] = str(largest)
+                invoice_data['tax_amount'] = str(largest - second)
             
             # Extract description (look for common service descriptions)
-            description_keywords = [
-                'service', 'product', 'consulting', 'software', 'license',
-                'support', 'maintenance', 'hardware', 'equipment'
-            ]
-            
-            description_lines = []
-            for line in lines:
-                for keyword in description_keywords:
-                    if keyword.lower() in line.lower():
-                        description_lines.append(line)
-                        break
+            # Only the first 2 relevant lines are used, so stop scanning once they are found
+            description_lines = list(islice(
+                (line for line in lines if _DESCRIPTION_RE.search(line)), 2
+            ))
             
             if description_lines:
-                invoice_data['description'] = ' '.join(description_lines[:2])  # First 2 relevant lines
+                invoice_data['description'] = ' '.join(description_lines)
             
             return invoice_data
             
@@ -223,27 +353,46 @@ class InvoiceOCRProcessor:
             invoice_data = self.parse_invoice_data(text)
             
             # Fill in defaults for missing fields
-            if not invoice_data['invoice_id']:
-                invoice_data['invoice_id'] = 'OCR-EXTRACTED'
-            if not invoice_data['vendor_name']:
-                invoice_data['vendor_name'] = 'Unknown Vendor'
-            if not invoice_data['amount']:
-                invoice_data['amount'] = '0.00'
-            if not invoice_data['tax_amount']:
-                invoice_data['tax_amount'] = '0.00'
-            if not invoice_data['tax_rate']:
-                invoice_data['tax_rate'] = '0.18'
-            if not invoice_data['description']:
-                invoice_data['description'] = 'OCR extracted invoice'
-            if not invoice_data['date']:
-                from datetime import datetime
-                invoice_data['date'] = datetime.now().strftime('%Y-%m-%d')
+            self._fill_missing_fields(invoice_data)
             
             return invoice_data
             
         except Exception as e:
             logger.error(f"Error processing invoice image: {str(e)}")
             raise
+    
+    def process_batch(self, image_paths: List[str], max_workers: Optional[int] = None) -> List[Dict[str, str]]:
+        """
+        Complete pipeline for several invoice images, run concurrently
+        
+        Args:
+            image_paths: Paths to the invoice images
+            max_workers: Maximum number of images processed at once (defaults to the CPU count)
+            
+        Returns:
+            List of dictionaries with extracted invoice data, in input order
+        """
+        # OpenCV and Tesseract release the GIL, so images run in parallel on the pool
+        with ThreadPoolExecutor(max_workers or os.cpu_count()) as executor:
+            return list(executor.map(self.process_invoice_image, image_paths))
+    
+    def _fill_missing_fields(self, invoice_data: Dict[str, str]) -> None:
+        """Fill in defaults for fields the parser could not find"""
+        if not invoice_data['invoice_id']:
+            invoice_data['invoice_id'] = 'OCR-EXTRACTED'
+        if not invoice_data['vendor_name']:
+            invoice_data['vendor_name'] = 'Unknown Vendor'
+        if not invoice_data['amount']:
+            invoice_data['amount'] = '0.00'
+        if not invoice_data['tax_amount']:
+            invoice_data['tax_amount'] = '0.00'
+        if not invoice_data['tax_rate']:
+            invoice_data['tax_rate'] = '0.18'
+        if not invoice_data['description']:
+            invoice_data['description'] = 'OCR extracted invoice'
+        if not invoice_data['date']:
+            from datetime import datetime
+            invoice_data['date'] = datetime.now().strftime('%Y-%m-%d')
 
 # Usage example
 if __name__ == "__main__":
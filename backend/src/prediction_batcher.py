@@ -0,0 +1,82 @@
+import asyncio
+import numpy as np
+
+
+class PredictionBatcher:
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5):
+        """
+        Collect feature vectors from concurrent requests and score them in one model call
+
+        Args:
+            predict_fn: Callable mapping an (n, n_features) array to n rows of results
+            max_batch_size: Maximum number of requests scored together
+            max_wait_ms: How long the first request of a batch waits for others to arrive under load
+        """
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._worker = None
+
+    def start(self):
+        """Start the background flush task on the running event loop"""
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel the background flush task"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+
+    async def predict(self, x):
+        """
+        Queue one feature vector and wait for its prediction
+
+        Args:
+            x: 1-D feature vector
+
+        Returns:
+            The row of predict_fn output for this vector
+        """
+        if self._worker is None:
+            raise RuntimeError("Prediction batcher is not running")
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((x, future))
+        return await future
+
+    async def _run(self):
+        """Gather queued requests into batches and flush them"""
+        last_batch_size = 0
+        while True:
+            batch = [await self._queue.get()]
+
+            # A lone request on an idle server is flushed right away; requests arriving during
+            # a flush form the next batch. Only under load (the last batch had company) give
+            # concurrent requests a moment to join, unless a full batch is already waiting.
+            if last_batch_size > 1 and self._queue.qsize() < self.max_batch_size - 1:
+                await asyncio.sleep(self.max_wait)
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            self._flush(batch)
+            last_batch_size = len(batch)
+
+    def _flush(self, batch):
+        """Score a batch in one call and scatter the results to the waiting requests"""
+        try:
+            results = self.predict_fn(np.vstack([x for x, _ in batch]))
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
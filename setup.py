@@ -40,6 +40,10 @@ def setup_backend():
     if not run_command("python src/model_trainer.py", cwd=backend_dir):
         return False
     
+    # Export models to ONNX for serving
+    if not run_command("python src/export_onnx.py", cwd=backend_dir):
+        return False
+    
     print("✅ Backend setup complete!")
     return True
 